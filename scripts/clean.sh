@@ -20,6 +20,7 @@ log_warn() {
 # Default values
 BUILD_DIR="build"
 KEEP_TESTS="false"
+CLEAN_CACHE="false"
 
 # Parse command line arguments
 while [[ $# -gt 0 ]]; do
@@ -32,8 +33,13 @@ while [[ $# -gt 0 ]]; do
             KEEP_TESTS="true"
             shift
             ;;
+        --cache)
+            CLEAN_CACHE="true"
+            shift
+            ;;
         --all)
             KEEP_TESTS="false"
+            CLEAN_CACHE="true"
             shift
             ;;
         -h|--help)
@@ -41,7 +47,8 @@ while [[ $# -gt 0 ]]; do
             echo "Options:"
             echo "  --build-dir DIR    Build directory (default: build)"
             echo "  --keep-tests       Keep generated test files"
-            echo "  --all              Clean everything including tests"
+            echo "  --cache            Remove the LLM response cache"
+            echo "  --all              Clean everything including tests and cache"
             echo "  -h, --help         Show this help"
             exit 0
             ;;
@@ -86,6 +93,12 @@ if [ "$KEEP_TESTS" = "false" ]; then
     find tests -name "*_test.cc" -delete 2>/dev/null || true
 fi
 
+# Remove LLM response cache (optional)
+if [ "$CLEAN_CACHE" = "true" ]; then
+    log_info "Removing LLM response cache..."
+    rm -rf cache
+fi
+
 # Remove Python cache
 log_info "Removing Python cache..."
 find . -name "__pycache__" -type d -exec rm -rf {} + 2>/dev/null || true
@@ -24,8 +24,8 @@ log_warn() {
 # Default values
 BUILD_DIR="build"
 OUTPUT_DIR="coverage-html"
-COVERAGE_FILE="coverage.info"
 FILTERED_FILE="coverage.filtered.info"
+PARALLEL_JOBS=$(nproc)
 
 # Parse command line arguments
 while [[ $# -gt 0 ]]; do
@@ -75,17 +75,15 @@ log_info "Generating coverage report..."
 log_info "Running tests to generate coverage data..."
 ctest --output-on-failure
 
-# Capture coverage data
+# Capture coverage data, excluding system files and external libraries
 log_info "Capturing coverage data..."
-lcov --capture --directory . --output-file "$COVERAGE_FILE"
-
-# Remove system files and external libraries
-log_info "Filtering coverage data..."
-lcov --remove "$COVERAGE_FILE" '/usr/*' '/opt/*' '*/tests/*' '*/build/*' --output-file "$FILTERED_FILE"
+lcov --capture --directory . --parallel "$PARALLEL_JOBS" \
+    --exclude '/usr/*' --exclude '/opt/*' --exclude '*/tests/*' --exclude '*/build/*' \
+    --output-file "$FILTERED_FILE"
 
 # Generate HTML report
 log_info "Generating HTML report..."
-genhtml "$FILTERED_FILE" --output-directory "$OUTPUT_DIR"
+genhtml "$FILTERED_FILE" --parallel "$PARALLEL_JOBS" --output-directory "$OUTPUT_DIR"
 
 # Generate text summary
 log_info "Generating text summary..."
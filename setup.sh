@@ -80,7 +80,7 @@ sudo usermod -aG docker $USER
 
 # Install Python dependencies
 log_info "Installing Python dependencies..."
-pip install --user requests pyyaml
+pip install --user requests aiohttp pyyaml
 
 # Verify Ollama installation
 log_info "Checking Ollama installation..."
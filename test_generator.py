@@ -7,43 +7,238 @@ Generates Google Test unit tests using LLaMA 3 via Ollama
 import os
 import sys
 import json
+import asyncio
+import aiohttp
 import yaml
 import subprocess
 import requests
+from requests.adapters import HTTPAdapter
 import re
 import shutil
 import argparse
+import functools
+import copy
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Awaitable, List, Dict, Optional, Tuple
+
+# Prefer the libyaml-backed loader; fall back to the pure-Python one
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
+# Supported LLM server backends
+_LLM_BACKENDS = ("ollama", "llama.cpp")
+# Request fields that do not affect the generated text
+_TRANSPORT_FIELDS = {"stream", "keep_alive", "cache_prompt"}
+
+# C++ source suffixes picked up when scanning a directory
+_SOURCE_EXTENSIONS = {'.cc', '.cpp', '.cxx'}
+
+# Lines of build/test output kept for error reporting
+_OUTPUT_TAIL_LINES = 200
+
+# Source analysis: classes, functions and includes in one pass, keyed by group name
+_CLASS_PATTERN = r'class\s+(?P<classes>\w+)\s*[:{]'
+_FUNC_PATTERN = r'\w+\s+(?P<functions>\w+)\s*\([^)]*\)\s*[{;]'
+_INC_PATTERN = r'#include\s*[<"](?P<includes>.*?)[>"]'
+_SOURCE_RE = re.compile('|'.join((_CLASS_PATTERN, _FUNC_PATTERN, _INC_PATTERN)))
+# Used once enough functions have been collected
+_CLASS_INC_RE = re.compile('|'.join((_CLASS_PATTERN, _INC_PATTERN)))
+# Function names collected per file (only these are listed in prompts)
+_MAX_FUNCTIONS = 10
+
+
+@functools.lru_cache(maxsize=32)
+def _load_yaml(path: str, mtime_ns: int, size: int) -> Dict:
+    """Parse a YAML file; mtime/size are part of the cache key only"""
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=_Loader)
+
+
+def _load_yaml_cached(path: Path) -> Dict:
+    """Load a YAML file, re-parsing only when it changed on disk
+
+    Returns a private copy so callers cannot mutate the cached parse.
+    """
+    st = os.stat(path)
+    return copy.deepcopy(_load_yaml(str(path), st.st_mtime_ns, st.st_size))
+
+
+def _shape_identifiers(classes: List[str]) -> Dict[str, str]:
+    """Map declared class names to positional placeholders
+
+    Function names and the file stem are left out: tests use them where they
+    cannot be told apart from library names of the same spelling (size, get,
+    time, ...). Files must therefore share them to share a shape, unless the
+    stem is itself a declared class name.
+    """
+    identifiers = {}
+    for i, name in enumerate(classes):
+        if name not in identifiers:
+            identifiers[name] = f"CLS_{i}"
+    return identifiers
+
+
+def _replace_words(text: str, mapping: Dict[str, str]) -> str:
+    """Replace whole-word occurrences of mapping keys in a single pass
+
+    A trailing "Test" is allowed so fixture names like FooTest follow Foo.
+    """
+    if not mapping:
+        return text
+    names = '|'.join(map(re.escape, sorted(mapping, key=len, reverse=True)))
+    pattern = re.compile(r'\b(' + names + r')(?=Test\b|\b)')
+    return pattern.sub(lambda m: mapping[m.group(1)], text)
+
+
+def _source_shape(content: str, identifiers: Dict[str, str], file_stem: str) -> str:
+    """Hash the source with identifiers and whitespace normalized away"""
+    skeleton = " ".join(_replace_words(content, identifiers).split())
+    if file_stem not in identifiers:
+        # The stem stays literal in generated tests, so it must match too
+        skeleton = f"{file_stem}\n{skeleton}"
+    return hashlib.sha256(skeleton.encode()).hexdigest()
+
+
+def _classify_path(file_path: str) -> str:
+    """Determine the source file type from its path alone"""
+    if "Controller" in file_path:
+        return "controller"
+    elif "models" in file_path:
+        return "model"
+    elif "plugins" in file_path:
+        return "plugin"
+    return "unknown"
+
+
+def _scan_content(file_path: str, with_shape: bool = False) -> Dict:
+    """Read a C++ source file and extract metadata from its content
+
+    Module-level so it can run in worker processes. The structural signature
+    costs an extra pass over the content, so it is only computed on request.
+    """
+    with open(file_path, 'r') as f:
+        content = f.read()
+
+    # Extract class names, function names, includes
+    found = {"classes": [], "functions": [], "includes": []}
+    scan = _SOURCE_RE.finditer(content)
+    for match in scan:
+        found[match.lastgroup].append(match.group(match.lastgroup))
+        if len(found["functions"]) == _MAX_FUNCTIONS:
+            # Function list is full; only classes and includes are left to find
+            scan = _CLASS_INC_RE.finditer(content, match.end())
+            break
+    for match in scan:
+        found[match.lastgroup].append(match.group(match.lastgroup))
+    classes, functions, includes = found["classes"], found["functions"], found["includes"]
+
+    file_info = {
+        "path": file_path,
+        "content": content,
+        "classes": classes,
+        "functions": functions,
+        "includes": includes
+    }
+
+    if with_shape:
+        # Structural signature: files differing only in type names share a shape
+        identifiers = _shape_identifiers(classes)
+        file_info["identifiers"] = identifiers
+        file_info["shape"] = _source_shape(content, identifiers, Path(file_path).stem)
+
+    return file_info
 
 class TestGenerator:
-    def __init__(self, config_dir: str = "."):
+    def __init__(self, config_dir: str = ".", use_cache: bool = True):
         self.config_dir = Path(config_dir)
         self.ollama_url = "http://localhost:11434/api/generate"
-        self.model = "llama3.1"
+        self.llama_cpp_url = "http://localhost:8080/v1/chat/completions"
+        # Ollama model tag; for llama.cpp, a label for the served GGUF (part of cache keys)
+        self.model = os.environ.get("LLM_MODEL", "llama3.1")
+        # "ollama", or "llama.cpp" to talk to llama-server directly
+        self.backend = os.environ.get("LLM_BACKEND", "ollama")
+        if self.backend not in _LLM_BACKENDS:
+            print(f"Error: Unknown LLM_BACKEND: {self.backend} (expected one of: {', '.join(_LLM_BACKENDS)})")
+            sys.exit(1)
+        self.llm_url = self.llama_cpp_url if self.backend == "llama.cpp" else self.ollama_url
+        # Keep the model (and its prompt cache) loaded between requests
+        self.keep_alive = "30m"
+        # Concurrent requests in flight; match the server's parallel slots
+        parallel_var = "LLM_NUM_PARALLEL" if "LLM_NUM_PARALLEL" in os.environ else "OLLAMA_NUM_PARALLEL"
+        num_parallel = os.environ.get(parallel_var, "4").strip()
+        if not num_parallel.isdigit() or int(num_parallel) < 1:
+            print(f"Error: {parallel_var} must be a positive integer, got: {num_parallel}")
+            sys.exit(1)
+        self.max_parallel = int(num_parallel)
+        # Reuse keep-alive connections for synchronous LLM calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        # On-disk LLM response cache, keyed by request content
+        self.use_cache = use_cache
+        self.cache_dir = self.config_dir / "cache"
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.shape_hits = 0
+        # Shape generations in progress this run, by skeleton cache file
+        self._shape_inflight: Dict[Path, asyncio.Future] = {}
+        # Requests issued during this run, by request hash
+        self._inflight: Dict[bytes, asyncio.Future] = {}
         self.load_configs()
 
+    def close(self):
+        """Release pooled HTTP connections"""
+        self.session.close()
+
+    def __enter__(self) -> "TestGenerator":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
     def load_configs(self):
         """Load YAML configuration files"""
         try:
-            with open(self.config_dir / "generate_tests.yaml", 'r') as f:
-                self.generate_config = yaml.safe_load(f)
-            with open(self.config_dir / "refine_tests.yaml", 'r') as f:
-                self.refine_config = yaml.safe_load(f)
-            with open(self.config_dir / "build_error_resolution.yaml", 'r') as f:
-                self.build_error_config = yaml.safe_load(f)
+            self.generate_config = _load_yaml_cached(self.config_dir / "generate_tests.yaml")
+            self.refine_config = _load_yaml_cached(self.config_dir / "refine_tests.yaml")
+            self.build_error_config = _load_yaml_cached(self.config_dir / "build_error_resolution.yaml")
         except FileNotFoundError as e:
             print(f"Error: Config file not found: {e}")
             sys.exit(1)
 
-    def call_llm(self, prompt: str, system_prompt: str = "", max_tokens: int = 4000) -> str:
-        """Make API call to local Ollama instance"""
+    def _build_request(self, prompt: str, system_prompt: str, max_tokens: int) -> Dict:
+        """Build the request body for the configured backend
+
+        Templates put their fixed instructions before the per-file fields, so
+        requests of the same kind share a prompt prefix the server can reuse.
+        """
+        if self.backend == "llama.cpp":
+            # llama-server chat endpoint applies the model's chat template;
+            # cache_prompt reuses the slot's KV cache
+            messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+            messages.append({"role": "user", "content": prompt})
+            return {
+                "model": self.model,
+                "messages": messages,
+                "stream": True,
+                "cache_prompt": True,
+                "max_tokens": max_tokens,
+                "temperature": 0.3,
+                "top_p": 0.9
+            }
+
         full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
 
-        data = {
+        return {
             "model": self.model,
             "prompt": full_prompt,
-            "stream": False,
+            "stream": True,
+            "keep_alive": self.keep_alive,
             "options": {
                 "temperature": 0.3,
                 "top_p": 0.9,
@@ -51,123 +246,372 @@ class TestGenerator:
             }
         }
 
+    def _cache_key(self, data: Dict) -> str:
+        """Hash the parts of a request that determine the response"""
+        key_data = {k: v for k, v in data.items() if k not in _TRANSPORT_FIELDS}
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+    def _llm_cache_get(self, key: str) -> Optional[str]:
+        """Return a cached LLM response, or None on a miss"""
+        if not self.use_cache:
+            return None
+
+        try:
+            with open(self.cache_dir / f"{key}.json", 'r') as f:
+                response = json.load(f)["response"]
+        except (OSError, ValueError, KeyError):
+            self.cache_misses += 1
+            return None
+
+        self.cache_hits += 1
+        return response
+
+    def _llm_cache_set(self, key: str, response: str):
+        """Store an LLM response in the cache"""
+        if not self.use_cache:
+            return
+
+        self._write_cache_file(self.cache_dir / f"{key}.json", {"response": response})
+
+    def _write_cache_file(self, cache_file: Path, entry: Dict):
+        """Atomically write a cache entry; failures only cost a future cache hit"""
+        tmp_file = cache_file.with_suffix(".tmp")
+        try:
+            os.makedirs(cache_file.parent, exist_ok=True)
+            with open(tmp_file, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            print(f"⚠️  Could not write cache entry {cache_file}: {e}")
+
+    def _shape_cache_file(self, file_info: Dict, prompt_template: str, system_prompt: str) -> Path:
+        """Locate the test skeleton cached for a file's shape and prompt"""
+        key_data = [self.backend, self.model, system_prompt, prompt_template, file_info["shape"]]
+        key = hashlib.sha256(json.dumps(key_data).encode()).hexdigest()
+        return self.cache_dir / "shapes" / f"{key}.json"
+
+    def _shape_cache_get(self, file_info: Dict, prompt_template: str, system_prompt: str) -> Optional[str]:
+        """Render a cached test skeleton with this file's identifiers, or None on a miss"""
+        if not self.use_cache:
+            return None
+
+        try:
+            with open(self._shape_cache_file(file_info, prompt_template, system_prompt), 'r') as f:
+                template = json.load(f)["template"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+        names = {placeholder: name for name, placeholder in file_info["identifiers"].items()}
+        try:
+            test_code = re.sub(r'@@(\w+)@@', lambda m: names[m.group(1)], template)
+        except KeyError:
+            return None
+
+        self.shape_hits += 1
+        return test_code
+
+    def _shape_cache_set(self, file_info: Dict, prompt_template: str, system_prompt: str, test_code: str):
+        """Store generated tests as a skeleton with this file's identifiers as placeholders"""
+        if not self.use_cache:
+            return
+
+        markers = {name: f"@@{placeholder}@@" for name, placeholder in file_info["identifiers"].items()}
+        self._write_cache_file(self._shape_cache_file(file_info, prompt_template, system_prompt),
+                               {"template": _replace_words(test_code, markers)})
+
+    def _read_stream_chunk(self, line: bytes, chunks: List[str]) -> bool:
+        """Append one streamed response chunk; return True once generation is done"""
+        if self.backend == "llama.cpp":
+            # Server-sent events: "data: {...}", "data: [DONE]" or "error: {...}"
+            line = line.strip()
+            if line.startswith(b"error:"):
+                raise ValueError(line[len(b"error:"):].decode().strip())
+            if not line.startswith(b"data:"):
+                return False
+            payload = line[len(b"data:"):].strip()
+            if payload == b"[DONE]":
+                return True
+            chunk = json.loads(payload)
+            if "error" in chunk:
+                raise ValueError(chunk["error"])
+            for choice in chunk.get("choices", []):
+                chunks.append(choice.get("delta", {}).get("content") or "")
+                if choice.get("finish_reason"):
+                    return True
+            return False
+
+        chunk = json.loads(line)
+        if "error" in chunk:
+            raise ValueError(chunk["error"])
+        chunks.append(chunk.get("response", ""))
+        return chunk.get("done", False)
+
+    def call_llm(self, prompt: str, system_prompt: str = "", max_tokens: int = 4000) -> str:
+        """Make API call to the local LLM server"""
+        data = self._build_request(prompt, system_prompt, max_tokens)
+        key = self._cache_key(data)
+
+        cached = self._llm_cache_get(key)
+        if cached is not None:
+            return cached
+
+        chunks = []
+        done = False
+        try:
+            with self.session.post(self.llm_url, json=data, stream=True, timeout=120) as response:
+                response.raise_for_status()
+                # Read to EOF even after "done" so the connection returns to the pool
+                for line in response.iter_lines():
+                    if line and not done:
+                        done = self._read_stream_chunk(line, chunks)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error calling LLM: {e}")
+            return ""
+
+        result = "".join(chunks)
+
+        if result:
+            self._llm_cache_set(key, result)
+        return result
+
+    async def call_llm_async(self, session: aiohttp.ClientSession, prompt: str,
+                             system_prompt: str = "", max_tokens: int = 4000) -> str:
+        """Make non-blocking API call to the local LLM server"""
+        data = self._build_request(prompt, system_prompt, max_tokens)
+
+        # Identical requests within a run share a single in-flight call
+        dedup_key = hashlib.blake2b(json.dumps(data, sort_keys=True).encode(), digest_size=16).digest()
+        request = self._inflight.get(dedup_key)
+        if request is None:
+            request = asyncio.ensure_future(self._post_llm_async(session, data))
+            self._inflight[dedup_key] = request
+
+        # Shield the shared call so one cancelled caller does not cancel it for the others
+        result = ""
         try:
-            response = requests.post(self.ollama_url, json=data, timeout=120)
-            response.raise_for_status()
-            return response.json()["response"]
-        except requests.exceptions.RequestException as e:
+            result = await asyncio.shield(request)
+        finally:
+            if not result and request.done() and self._inflight.get(dedup_key) is request:
+                # Let a later identical call retry after a failure or exception
+                del self._inflight[dedup_key]
+        return result
+
+    async def _post_llm_async(self, session: aiohttp.ClientSession, data: Dict) -> str:
+        """Send a request to the LLM server, consulting the response cache first"""
+        key = self._cache_key(data)
+
+        cached = self._llm_cache_get(key)
+        if cached is not None:
+            return cached
+
+        # Time out on a stalled stream, not on a long generation or a connection wait
+        timeout = aiohttp.ClientTimeout(total=None, sock_read=120)
+
+        chunks = []
+        done = False
+        try:
+            async with session.post(self.llm_url, json=data, timeout=timeout) as response:
+                response.raise_for_status()
+                # Read to EOF even after "done" so the connection returns to the pool
+                async for line in response.content:
+                    if line.strip() and not done:
+                        done = self._read_stream_chunk(line, chunks)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
             print(f"Error calling LLM: {e}")
             return ""
 
+        result = "".join(chunks)
+
+        if result:
+            self._llm_cache_set(key, result)
+        return result
+
+    def _client_session(self) -> aiohttp.ClientSession:
+        """Create a keep-alive HTTP session capped at max_parallel connections"""
+        connector = aiohttp.TCPConnector(limit=self.max_parallel, keepalive_timeout=60)
+        return aiohttp.ClientSession(connector=connector)
+
     def analyze_source_file(self, file_path: str) -> Dict:
         """Analyze C++ source file and extract metadata"""
-        with open(file_path, 'r') as f:
-            content = f.read()
-
-        # Extract class names, function names, includes
-        classes = re.findall(r'class\s+(\w+)\s*[:{]', content)
-        functions = re.findall(r'\w+\s+(\w+)\s*\([^)]*\)\s*[{;]', content)
-        includes = re.findall(r'#include\s*[<"](.*?)[>"]', content)
-
-        file_type = "unknown"
-        if "Controller" in file_path:
-            file_type = "controller"
-        elif "models" in file_path:
-            file_type = "model"
-        elif "plugins" in file_path:
-            file_type = "plugin"
+        file_info = _scan_content(file_path, self.use_cache)
+        file_info["type"] = _classify_path(file_path)
+        return file_info
 
-        return {
-            "path": file_path,
-            "content": content,
-            "classes": classes,
-            "functions": functions,
-            "includes": includes,
-            "type": file_type
-        }
+    async def _generate_test(self, session: aiohttp.ClientSession, file_path: str, scan: Awaitable[Dict],
+                             prompt_template: str, system_prompt: str, test_dir: str) -> Optional[str]:
+        """Generate unit tests for a single source file once its scan completes"""
+        print(f"🔍 Analyzing {file_path}...")
+        file_info = await scan
 
-    def generate_tests(self, source_files: List[str], test_dir: str) -> List[str]:
-        """Generate initial unit tests for source files"""
-        generated_files = []
+        prompt = prompt_template.format(
+            source_code=file_info["content"],
+            file_name=os.path.basename(file_path),
+            classes=", ".join(file_info["classes"]),
+            functions=", ".join(file_info["functions"])  # Capped at _MAX_FUNCTIONS
+        )
 
+        test_code = None
+        leader = None
+        if self.use_cache:
+            # Reuse tests of a structurally identical file, renamed. If one is
+            # being generated right now, wait for it rather than call the LLM.
+            shape_file = self._shape_cache_file(file_info, prompt_template, system_prompt)
+            pending = self._shape_inflight.get(shape_file)
+            if pending is not None:
+                await asyncio.shield(pending)
+            test_code = self._shape_cache_get(file_info, prompt_template, system_prompt)
+            if not test_code and shape_file not in self._shape_inflight:
+                leader = asyncio.get_running_loop().create_future()
+                self._shape_inflight[shape_file] = leader
+
+        if test_code:
+            print(f"♻️  Reusing tests of a structurally identical file for {file_path}")
+        else:
+            print(f"🤖 Generating tests for {file_path}...")
+            try:
+                test_code = await self.call_llm_async(session, prompt, system_prompt)
+                if test_code:
+                    self._shape_cache_set(file_info, prompt_template, system_prompt, test_code)
+            finally:
+                if leader is not None:
+                    del self._shape_inflight[shape_file]
+                    leader.set_result(None)
+
+        if not test_code:
+            print(f"❌ Failed to generate tests for {file_path}")
+            return None
+
+        # Save generated test
+        test_file_name = f"{Path(file_path).stem}Test.cc"
+        test_file_path = os.path.join(test_dir, test_file_name)
+
+        with open(test_file_path, 'w') as f:
+            f.write(test_code)
+
+        print(f"✅ Generated {test_file_path}")
+        return test_file_path
+
+    async def generate_tests_async(self, source_files: List[str], test_dir: str) -> List[str]:
+        """Generate initial unit tests for source files concurrently"""
+        # Classify by path and group by type: every file in a group shares the
+        # same system prompt and template, so they are submitted back-to-back
+        groups: Dict[str, List[str]] = {}
         for file_path in source_files:
-            print(f"🔍 Analyzing {file_path}...")
-            file_info = self.analyze_source_file(file_path)
+            groups.setdefault(_classify_path(file_path), []).append(file_path)
 
-            # Get generation rules for this file type
-            rules = self.generate_config.get("rules", {}).get(file_info["type"], {})
+        system_prompt = self.generate_config.get("system_prompt", "")
+        jobs = []
+        for file_type, file_paths in groups.items():
+            # Get generation rules for this file type; files without rules are never read
+            rules = self.generate_config.get("rules", {}).get(file_type, {})
             if not rules:
-                print(f"⚠️  No rules found for file type: {file_info['type']}")
+                print(f"⚠️  No rules found for file type: {file_type} ({len(file_paths)} files skipped)")
                 continue
 
-            # Build prompt
             prompt_template = rules.get("prompt_template", "")
-            system_prompt = self.generate_config.get("system_prompt", "")
+            jobs.extend((file_path, prompt_template) for file_path in file_paths)
+
+        loop = asyncio.get_running_loop()
+        workers = max(1, min(os.cpu_count() or 1, len(jobs)))
+        # Scan files on all cores; each file's LLM call starts as soon as its own
+        # scan finishes. One keep-alive session for the whole batch.
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            async with self._client_session() as session:
+                results = await asyncio.gather(
+                    *(self._generate_test(session, file_path, loop.run_in_executor(pool, _scan_content, file_path, self.use_cache),
+                                          prompt_template, system_prompt, test_dir)
+                      for file_path, prompt_template in jobs),
+                    return_exceptions=True
+                )
 
-            prompt = prompt_template.format(
-                source_code=file_info["content"],
-                file_name=os.path.basename(file_path),
-                classes=", ".join(file_info["classes"]),
-                functions=", ".join(file_info["functions"][:10])  # Limit to first 10
-            )
-
-            print(f"🤖 Generating tests for {file_path}...")
-            test_code = self.call_llm(prompt, system_prompt)
+        generated_files = []
+        for (file_path, _), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                print(f"❌ Failed to generate tests for {file_path}: {result}")
+            elif result:
+                generated_files.append(result)
 
-            if test_code:
-                # Save generated test
-                test_file_name = f"{Path(file_path).stem}Test.cc"
-                test_file_path = os.path.join(test_dir, test_file_name)
+        return generated_files
 
-                with open(test_file_path, 'w') as f:
-                    f.write(test_code)
+    def generate_tests(self, source_files: List[str], test_dir: str) -> List[str]:
+        """Generate initial unit tests for source files"""
+        return asyncio.run(self.generate_tests_async(source_files, test_dir))
 
-                generated_files.append(test_file_path)
-                print(f"✅ Generated {test_file_path}")
-            else:
-                print(f"❌ Failed to generate tests for {file_path}")
+    async def _refine_test(self, session: aiohttp.ClientSession, test_file: str) -> Optional[str]:
+        """Refine a single generated test file"""
+        print(f"🔧 Refining {test_file}...")
 
-        return generated_files
+        with open(test_file, 'r') as f:
+            test_content = f.read()
 
-    def refine_tests(self, test_files: List[str]) -> List[str]:
-        """Refine generated tests using LLM"""
-        refined_files = []
+        # Build refinement prompt
+        prompt_template = self.refine_config.get("prompt_template", "")
+        system_prompt = self.refine_config.get("system_prompt", "")
 
-        for test_file in test_files:
-            print(f"🔧 Refining {test_file}...")
+        prompt = prompt_template.format(
+            test_code=test_content,
+            file_name=os.path.basename(test_file)
+        )
 
-            with open(test_file, 'r') as f:
-                test_content = f.read()
+        refined_code = await self.call_llm_async(session, prompt, system_prompt)
 
-            # Build refinement prompt
-            prompt_template = self.refine_config.get("prompt_template", "")
-            system_prompt = self.refine_config.get("system_prompt", "")
+        if not refined_code:
+            print(f"❌ Failed to refine {test_file}")
+            return None
 
-            prompt = prompt_template.format(
-                test_code=test_content,
-                file_name=os.path.basename(test_file)
+        # Backup original: hardlink it, copying only across filesystems
+        backup_file = test_file + ".backup"
+        if os.path.lexists(backup_file):
+            os.remove(backup_file)
+        try:
+            os.link(test_file, backup_file)
+        except OSError:
+            shutil.copy2(test_file, backup_file)
+
+        # Save refined version to a new inode so the hardlinked backup is untouched
+        tmp_file = test_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            f.write(refined_code)
+        os.replace(tmp_file, test_file)
+
+        print(f"✅ Refined {test_file}")
+        return test_file
+
+    async def refine_tests_async(self, test_files: List[str]) -> List[str]:
+        """Refine generated tests using LLM concurrently"""
+        async with self._client_session() as session:
+            results = await asyncio.gather(
+                *(self._refine_test(session, test_file) for test_file in test_files),
+                return_exceptions=True
             )
 
-            refined_code = self.call_llm(prompt, system_prompt)
+        refined_files = []
+        for test_file, result in zip(test_files, results):
+            if isinstance(result, Exception):
+                print(f"❌ Failed to refine {test_file}: {result}")
+            elif result:
+                refined_files.append(result)
+
+        return refined_files
 
-            if refined_code:
-                # Backup original
-                backup_file = test_file + ".backup"
-                shutil.copy2(test_file, backup_file)
+    def refine_tests(self, test_files: List[str]) -> List[str]:
+        """Refine generated tests using LLM"""
+        return asyncio.run(self.refine_tests_async(test_files))
 
-                # Save refined version
-                with open(test_file, 'w') as f:
-                    f.write(refined_code)
+    def _run_streaming(self, cmd: List[str], cwd: str) -> Tuple[int, str]:
+        """Run a command, echoing its output live; return exit code and output tail"""
+        tail = deque(maxlen=_OUTPUT_TAIL_LINES)
 
-                refined_files.append(test_file)
-                print(f"✅ Refined {test_file}")
-            else:
-                print(f"❌ Failed to refine {test_file}")
+        with subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                              text=True, bufsize=1) as process:
+            for line in process.stdout:
+                sys.stdout.write(line)
+                tail.append(line.rstrip("\n"))
 
-        return refined_files
+        return process.returncode, "\n".join(tail)
 
-    def build_tests(self, test_dir: str, build_dir: str = "build") -> bool:
-        """Build the project with tests"""
+    def build_tests(self, test_dir: str, build_dir: str = "build", max_attempts: int = 3) -> bool:
+        """Build the project with tests, fixing build errors between attempts"""
         print(f"🔨 Building tests in {build_dir}...")
 
         # Create build directory
@@ -187,20 +631,22 @@ class TestGenerator:
             print(f"❌ CMake configuration failed:\n{result.stderr}")
             return False
 
-        # Build
+        # Build; configuration is reused across retries
         build_cmd = ["cmake", "--build", ".", "--parallel"]
-        result = subprocess.run(build_cmd, cwd=build_dir, capture_output=True, text=True)
+        for attempt in range(1, max_attempts + 1):
+            returncode, output_tail = self._run_streaming(build_cmd, build_dir)
 
-        if result.returncode != 0:
-            print(f"❌ Build failed:\n{result.stderr}")
+            if returncode == 0:
+                print("✅ Build successful!")
+                return True
+
+            print(f"❌ Build failed (attempt {attempt}/{max_attempts})")
             # Try to fix build errors
-            if self.fix_build_errors(result.stderr, test_dir):
-                print("🔧 Applied fixes, retrying build...")
-                return self.build_tests(test_dir, build_dir)
-            return False
+            if attempt == max_attempts or not self.fix_build_errors(output_tail, test_dir):
+                return False
+            print("🔧 Applied fixes, retrying build...")
 
-        print("✅ Build successful!")
-        return True
+        return False
 
     def fix_build_errors(self, error_output: str, test_dir: str) -> bool:
         """Attempt to fix build errors using LLM"""
@@ -234,48 +680,51 @@ class TestGenerator:
         # This is a simplified version - in reality, you'd parse the fix_suggestion
         # and apply specific changes to files
 
-        test_files = Path(test_dir).glob("*.cc")
+        with os.scandir(test_dir) as entries:
+            test_files = [entry.path for entry in entries if entry.name.endswith(".cc") and entry.is_file()]
 
         for test_file in test_files:
             with open(test_file, 'r') as f:
                 content = f.read()
 
             # Common fixes
-            if "#include <gtest/gtest.h>" not in content:
-                content = "#include <gtest/gtest.h>\n" + content
+            needs_gtest = "#include <gtest/gtest.h>" not in content
+            needs_drogon = "#include <drogon/drogon.h>" not in content
+            if not (needs_gtest or needs_drogon):
+                continue
 
-            if "#include <drogon/drogon.h>" not in content:
-                content = "#include <drogon/drogon.h>\n" + content
+            prefix = ""
+            if needs_drogon:
+                prefix += "#include <drogon/drogon.h>\n"
+            if needs_gtest:
+                prefix += "#include <gtest/gtest.h>\n"
 
             with open(test_file, 'w') as f:
-                f.write(content)
+                f.write(prefix + content)
 
     def run_tests(self, build_dir: str = "build") -> bool:
         """Run the generated tests"""
         print("🧪 Running tests...")
 
-        result = subprocess.run(
-            ["ctest", "--output-on-failure", "--parallel"], 
-            cwd=build_dir, 
-            capture_output=True, 
-            text=True
-        )
+        returncode, _ = self._run_streaming(["ctest", "--output-on-failure", "--parallel"], build_dir)
 
-        if result.returncode == 0:
+        if returncode == 0:
             print("✅ All tests passed!")
             return True
         else:
-            print(f"❌ Some tests failed:\n{result.stdout}")
+            print("❌ Some tests failed")
             return False
 
     def generate_coverage_report(self, build_dir: str = "build"):
         """Generate coverage report using lcov"""
         print("📊 Generating coverage report...")
 
+        # Capture and filter in one pass; lcov >= 2.0 spreads the work across cores
+        jobs = str(os.cpu_count() or 1)
         commands = [
-            ["lcov", "--capture", "--directory", ".", "--output-file", "coverage.info"],
-            ["lcov", "--remove", "coverage.info", "/usr/*", "--output-file", "coverage.filtered.info"],
-            ["genhtml", "coverage.filtered.info", "--output-directory", "coverage-html"]
+            ["lcov", "--capture", "--directory", ".", "--parallel", jobs,
+             "--exclude", "/usr/*", "--output-file", "coverage.filtered.info"],
+            ["genhtml", "coverage.filtered.info", "--parallel", jobs, "--output-directory", "coverage-html"]
         ]
 
         for cmd in commands:
@@ -304,51 +753,58 @@ def main():
     parser.add_argument("--build-dir", default="build", help="Build directory")
     parser.add_argument("--skip-build", action="store_true", help="Skip building tests")
     parser.add_argument("--skip-coverage", action="store_true", help="Skip coverage analysis")
+    parser.add_argument("--no-cache", action="store_true", help="Always query the LLM, ignoring cached responses")
 
     args = parser.parse_args()
 
-    # Initialize generator
-    generator = TestGenerator()
-
-    # Find source files
-    source_files = []
-    if os.path.isfile(args.source_path):
-        source_files = [args.source_path]
-    elif os.path.isdir(args.source_path):
-        for ext in ['*.cc', '*.cpp', '*.cxx']:
-            source_files.extend(Path(args.source_path).rglob(ext))
-        source_files = [str(f) for f in source_files]
-
-    if not source_files:
-        print("❌ No source files found!")
-        sys.exit(1)
-
-    print(f"📁 Found {len(source_files)} source files")
-
-    # Create test directory
-    os.makedirs(args.test_dir, exist_ok=True)
+    # Initialize generator; closing it releases pooled connections
+    with TestGenerator(use_cache=not args.no_cache) as generator:
+        # Find source files
+        source_files = []
+        if os.path.isfile(args.source_path):
+            source_files = [args.source_path]
+        elif os.path.isdir(args.source_path):
+            # Single walk of the tree, filtering by suffix
+            source_files = [
+                os.path.join(root, name)
+                for root, _, names in os.walk(args.source_path)
+                for name in names
+                if os.path.splitext(name)[1] in _SOURCE_EXTENSIONS
+            ]
+
+        if not source_files:
+            print("❌ No source files found!")
+            sys.exit(1)
 
-    # Generate tests
-    generated_files = generator.generate_tests(source_files, args.test_dir)
+        print(f"📁 Found {len(source_files)} source files")
 
-    if not generated_files:
-        print("❌ No tests generated!")
-        sys.exit(1)
+        # Create test directory
+        os.makedirs(args.test_dir, exist_ok=True)
 
-    # Refine tests
-    refined_files = generator.refine_tests(generated_files)
+        # Generate tests
+        generated_files = generator.generate_tests(source_files, args.test_dir)
 
-    if not args.skip_build:
-        # Build tests
-        if generator.build_tests(args.test_dir, args.build_dir):
-            # Run tests
-            if generator.run_tests(args.build_dir) and not args.skip_coverage:
-                # Generate coverage
-                generator.generate_coverage_report(args.build_dir)
+        if not generated_files:
+            print("❌ No tests generated!")
+            sys.exit(1)
 
-    print("\n🎉 Test generation complete!")
-    print(f"Generated {len(generated_files)} test files in {args.test_dir}/")
-    print(f"Build artifacts in {args.build_dir}/")
+        # Refine tests
+        refined_files = generator.refine_tests(generated_files)
+
+        if not args.skip_build:
+            # Build tests
+            if generator.build_tests(args.test_dir, args.build_dir):
+                # Run tests
+                if generator.run_tests(args.build_dir) and not args.skip_coverage:
+                    # Generate coverage
+                    generator.generate_coverage_report(args.build_dir)
+
+        print("\n🎉 Test generation complete!")
+        print(f"Generated {len(generated_files)} test files in {args.test_dir}/")
+        print(f"Build artifacts in {args.build_dir}/")
+        if generator.use_cache:
+            print(f"LLM cache: {generator.cache_hits} hits, {generator.cache_misses} misses, "
+                  f"{generator.shape_hits} structural hits")
 
 if __name__ == "__main__":
     main()